@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3
+# distutils: libraries = wiredtiger
+"""
+WiredTiger 游标批量读取的 C 扩展 (可选)
+
+在 C 中循环调用 WT_CURSOR::next，一次返回一批记录，省去每行 cursor.next()、
+get_key()、get_value() 的解释器调度和 Python 层的解包。
+只处理 MongoDB 集合表的格式 (key_format=q, value_format=u)，其他格式由
+wt_reader.py 回退到纯 Python 实现。
+
+扩展按编译时 wiredtiger.h 的结构体布局访问 WT_CURSOR，编译时的版本号通过
+WIREDTIGER_VERSION 导出；wt_reader.py 只在它与 wiredtiger Python 包加载的
+库版本一致时才启用本扩展。
+
+构建 (需要 Cython 以及 libwiredtiger 的头文件和库):
+    cythonize -i _wt_fast.pyx
+"""
+
+from libc.stdint cimport int64_t, uint32_t, uintptr_t
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
+from wiredtiger import WiredTigerError
+
+cdef extern from "wiredtiger.h":
+    int WIREDTIGER_VERSION_MAJOR
+    int WIREDTIGER_VERSION_MINOR
+    int WIREDTIGER_VERSION_PATCH
+
+    cdef struct __wt_session:
+        pass
+    ctypedef __wt_session WT_SESSION
+
+    ctypedef struct WT_ITEM:
+        const void *data
+        size_t size
+
+    cdef struct __wt_cursor:
+        WT_SESSION *session
+        const char *key_format
+        const char *value_format
+        uint32_t flags
+        int (*next)(__wt_cursor *) nogil
+        int (*get_key)(__wt_cursor *, ...) nogil
+        int (*get_value)(__wt_cursor *, ...) nogil
+    ctypedef __wt_cursor WT_CURSOR
+
+    int WT_NOTFOUND
+    uint32_t WT_CURSTD_RAW
+
+    int wiredtiger_struct_unpack(WT_SESSION *session, const void *buffer,
+                                 size_t size, const char *format, ...) nogil
+
+
+# 编译时使用的 wiredtiger.h 版本 (major, minor, patch)
+WIREDTIGER_VERSION = (WIREDTIGER_VERSION_MAJOR, WIREDTIGER_VERSION_MINOR, WIREDTIGER_VERSION_PATCH)
+
+
+def next_batch(uintptr_t cursor_addr, Py_ssize_t max_rows, bint keys_only=False):
+    """
+    从游标当前位置起继续读取最多 max_rows 行
+
+    Python 绑定打开的游标总是 raw 模式，key/value 以 WT_ITEM 形式取出，
+    key 在 C 中按 "q" 格式解包。
+
+    Args:
+        cursor_addr: WT_CURSOR 指针地址，即 int(cursor.this)
+        max_rows: 本批最多读取的行数
+        keys_only: 只读取 key，不拷贝 value
+
+    Returns:
+        list: (key, value) 元组列表；keys_only 为 True 时为 key 列表。
+            返回空列表表示游标已读完
+    """
+    cdef WT_CURSOR *c = <WT_CURSOR *>cursor_addr
+    cdef WT_ITEM k, v
+    cdef int64_t recno = 0
+    cdef int ret = 0
+    cdef Py_ssize_t n = 0
+    cdef list batch = []
+
+    if not (c.flags & WT_CURSTD_RAW):
+        raise WiredTigerError("_wt_fast.next_batch 只支持 raw 模式的游标")
+
+    while n < max_rows:
+        with nogil:
+            ret = c.next(c)
+            if ret == 0:
+                ret = c.get_key(c, &k)
+            if ret == 0:
+                ret = wiredtiger_struct_unpack(c.session, k.data, k.size, "q", &recno)
+            if ret == 0 and not keys_only:
+                ret = c.get_value(c, &v)
+        if ret == WT_NOTFOUND:
+            break
+        if ret != 0:
+            raise WiredTigerError(f"cursor.next() failed with code: {ret}")
+
+        if keys_only:
+            batch.append(recno)
+        else:
+            batch.append((recno, PyBytes_FromStringAndSize(<const char *>v.data, v.size)))
+        n += 1
+
+    return batch
@@ -1,52 +1,169 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import itertools
 import os
+import queue
+import re
 import sys
+import threading
+import time
 import wiredtiger
-from typing import Optional, List, Dict
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, List, Dict, Iterable, Iterator, Tuple
 import logging
 
+try:
+    import bson # 由 pymongo 提供，仅 decode_bson=True 时需要
+except ImportError:
+    bson = None
+
+try:
+    import _wt_fast # 可选的 C 扩展，构建方法见 _wt_fast.pyx
+except ImportError:
+    _wt_fast = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _wiredtiger_version() -> Optional[Tuple[int, int, int]]:
+    """返回 wiredtiger Python 包实际加载的库版本 (major, minor, patch)，无法识别时返回 None"""
+    try:
+        version = wiredtiger.wiredtiger_version()
+    except Exception:
+        return None
+    # SWIG 把 int * 输出参数追加在返回值之后：[版本字符串, major, minor, patch]
+    if isinstance(version, (list, tuple)) and len(version) >= 4:
+        return tuple(int(v) for v in version[1:4])
+    match = re.search(r"(\d+)\.(\d+)\.(\d+)", str(version))
+    return tuple(int(v) for v in match.groups()) if match else None
+
+
+# _wt_fast 按编译时 wiredtiger.h 的结构体布局访问游标，与运行时的库版本不一致时
+# 会读到错误的字段甚至使进程崩溃，因此只在版本完全一致时启用
+if _wt_fast is not None:
+    _runtime_version = _wiredtiger_version()
+    if getattr(_wt_fast, "WIREDTIGER_VERSION", None) != _runtime_version:
+        logger.warning("_wt_fast 编译时的 WiredTiger 版本 %s 与运行时版本 %s 不一致，已禁用",
+                       getattr(_wt_fast, "WIREDTIGER_VERSION", None), _runtime_version)
+        _wt_fast = None
+
+# 一条 WiredTiger 记录。相比每行一个 dict 更省内存，仍可按 row.key / row.value 访问
+# key 通常是 WiredTiger 的内部记录 ID 或索引键；
+# 对于 MongoDB，value 通常是 BSON 编码的字节串，可能需要 BSON 解码
+Row = namedtuple("Row", ("key", "value"))
+
+# 列出集合时需要跳过的表 (索引表和 MongoDB 内部的 sizeStorer 表)
+SKIP_TABLE_PREFIXES = ("table:index-", "table:sizeStorer")
+
+# 只读场景下使用 read-uncommitted 省去快照维护
+SESSION_CONFIG = "isolation=read-uncommitted"
+
+# 读取游标配置；默认从最近一次检查点读取，省去逐行的事务可见性检查
+CURSOR_CONFIG = "readonly=true"
+CHECKPOINT_CURSOR_CONFIG = "checkpoint=WiredTigerCheckpoint,readonly=true"
+
+# decode_bson=True 时每批交给 bson.decode_all 的文档数
+BSON_DECODE_BATCH = 1024
+
+# _wt_fast 每次在 C 中连续读取的行数
+FAST_BATCH_ROWS = 1024
+
+# read_collection_prefetch 的默认批大小和队列深度
+PREFETCH_BATCH_ROWS = 1024
+PREFETCH_QUEUE_DEPTH = 4
+
+# 预读线程结束的标记
+_PREFETCH_DONE = object()
+
 class WiredTigerReader:
-    def __init__(self, data_dir: str):
+    """
+    MongoDB WiredTiger 数据文件的只读读取器
+
+    连接参数针对长时间的顺序扫描做了调整，可通过 connect() 的参数修改：
+        cache_size_mb: WiredTiger 块缓存大小 (MB)，冷缓存下的长范围扫描可适当调大
+        session_max: 最大会话数
+        mmap: 是否用 mmap 映射数据文件 (WiredTiger 默认开启)
+        direct_io: 绕过操作系统页缓存的文件类型，如 "data"，冷缓存大表扫描时
+            避免数据在页缓存和块缓存中各存一份；一般与 mmap=False 一起使用
+    其他 wiredtiger_open 配置可以通过 __init__ 的 wt_config_extra 追加。
+
+    会话以 read-uncommitted 隔离级别打开，只读场景下省去快照维护的开销；
+    读取游标以 readonly 方式打开，默认读取最近一次检查点 (见 read_collection 的 use_checkpoint)。
+
+    self.session 供单线程调用使用；read_collections_parallel 会为每个工作线程
+    在同一连接上单独打开会话 (WiredTiger 会话不能跨线程共享)。
+    """
+
+    # 属性固定，用 __slots__ 代替实例 __dict__；子类新增属性时需要声明自己的 __slots__
+    __slots__ = ("data_dir", "wt_config_extra", "conn", "session", "collections_ttl", "_coll_cache",
+                 "_prefetchers")
+
+    def __init__(self, data_dir: str, collections_ttl: float = 30.0, wt_config_extra: str = ""):
         """
         初始化WiredTiger读取器
 
         Args:
             data_dir: MongoDB数据目录路径
+            collections_ttl: list_collections 结果的缓存时间 (秒)，0 表示不缓存
+            wt_config_extra: 追加到 wiredtiger_open 配置末尾的字符串，
+                同名配置项会覆盖前面的默认值
         """
         self.data_dir = data_dir
+        self.wt_config_extra = wt_config_extra
         self.conn = None
         self.session = None # 新增 session 属性
+        self.collections_ttl = collections_ttl
+        self._coll_cache: Optional[Tuple[float, List[str]]] = None # (缓存时间, 集合列表)
+        self._prefetchers = set() # 仍在运行的预读线程 (stop 事件, 线程)，close() 时需要先停止
 
-    def connect(self) -> bool:
+    def connect(self, cache_size_mb: int = 1024, session_max: int = 256,
+                mmap: Optional[bool] = None, direct_io: Optional[str] = None) -> bool:
         """
         连接到WiredTiger数据库
 
+        Args:
+            cache_size_mb: 块缓存大小 (MB)
+            session_max: 最大会话数
+            mmap: 是否用 mmap 映射数据文件，None 表示使用 WiredTiger 的默认值
+            direct_io: 使用直接 I/O 的文件类型，如 "data" 或 "data,log"，None 表示不使用
+
         Returns:
             bool: 连接是否成功
         """
+        # 建议添加 error_prefix 参数以便更好地定位错误；
+        # 其余参数面向扫描负载：更大的缓存，多线程驱逐避免缓存满时卡顿
+        config = (
+            "create=false,readonly=true,error_prefix='WiredTigerReader: ',"
+            f"cache_size={cache_size_mb}M,eviction=(threads_max=4),"
+            f"session_max={session_max},statistics=(fast)"
+        )
+        if mmap is not None:
+            config += f",mmap={'true' if mmap else 'false'}"
+        if direct_io:
+            config += f",direct_io=[{direct_io}]"
+        if self.wt_config_extra:
+            config += f",{self.wt_config_extra}"
         try:
-            self.conn = wiredtiger.wiredtiger_open(
-                self.data_dir,
-                # 建议添加 error_prefix 参数以便更好地定位错误
-                "create=false,readonly=true,error_prefix='WiredTigerReader: '"
-            )
+            self.conn = wiredtiger.wiredtiger_open(self.data_dir, config)
+            self._coll_cache = None
             # 创建 session
-            self.session = self.conn.open_session()
+            self.session = self.conn.open_session(SESSION_CONFIG)
             logger.info("成功连接到WiredTiger数据库并打开会话")
             return True
         except Exception as e:
-            logger.error(f"连接WiredTiger数据库失败: {str(e)}")
+            logger.error("连接WiredTiger数据库失败: %s", e)
             return False
 
     def list_collections(self) -> List[str]:
         """
         列出所有集合
 
+        集合很少变化，结果会缓存 collections_ttl 秒，期间重复调用不再扫描元数据表；
+        需要立即刷新时调用 invalidate_collections_cache()。
+
         Returns:
             List[str]: 集合名称列表
         """
@@ -54,6 +171,11 @@ class WiredTigerReader:
             logger.error("未连接到数据库或会话未打开")
             return []
 
+        if self._coll_cache is not None:
+            cached_at, cached = self._coll_cache
+            if time.monotonic() - cached_at < self.collections_ttl:
+                return list(cached)
+
         try:
             # 通过 self.session 打开游标
             # WiredTiger 的元数据表通常是 "metadata:collection" 或类似的，
@@ -82,98 +204,429 @@ class WiredTigerReader:
             # 不过，按照你原来的代码逻辑，我们先修改为使用 session：
             meta_cursor = self.session.open_cursor('metadata:', None, None)
             collections = []
-            for uri, conf_string in meta_cursor:
-                if uri.startswith("table:") and not uri.startswith("table:index-") and not uri.startswith("table:sizeStorer"):
-                     # 从 "table:yourDb.yourCollection" 中提取 "yourDb.yourCollection"
-                    collection_name_with_db = uri.split(":", 1)[1]
-                    # 如果你的集合名不包含数据库前缀，则可能需要进一步处理
-                    collections.append(collection_name_with_db)
-            meta_cursor.close()
-
-            # 如果你确定 "table:collection" 是一个特殊的表，包含所有集合名作为键，
-            # 那么你的原始逻辑，在修正了 session 调用后，可能是这样的：
-            # cursor = self.session.open_cursor("table:collection", None, None)
-            # collections = []
-            # while True:
-            #     try:
-            #         ret = cursor.next()
-            #         if ret != 0: # WT_NOTFOUND or error
-            #             break
-            #         collections.append(cursor.get_key())
-            #     except wiredtiger.WiredTigerError as e:
-            #         if "WT_NOTFOUND" in str(e): # 明确检查 WT_NOTFOUND
-            #             break
-            #         else:
-            #             raise e # 其他错误则抛出
-            # cursor.close()
+            collections_append = collections.append
+            # 只需要 URI，不读取配置字符串 (value)，也就省去了每行的解包
+            nxt = meta_cursor.next
+            getk = meta_cursor.get_key
+            WT_NF = wiredtiger.WT_NOTFOUND
+            try:
+                while nxt() != WT_NF:
+                    uri = getk()
+                    if uri.startswith("table:") and not uri.startswith(SKIP_TABLE_PREFIXES):
+                        # 从 "table:yourDb.yourCollection" 中提取 "yourDb.yourCollection"
+                        # 如果你的集合名不包含数据库前缀，则可能需要进一步处理
+                        collections_append(uri[6:])
+            finally:
+                meta_cursor.close()
+            if self.collections_ttl > 0:
+                self._coll_cache = (time.monotonic(), list(collections))
 
             return collections
         except Exception as e:
-            logger.error(f"获取集合列表失败: {str(e)}")
+            logger.error("获取集合列表失败: %s", e)
             return []
 
-    def read_collection(self, collection_name: str, limit: Optional[int] = None) -> List[Dict]:
+    def invalidate_collections_cache(self):
+        """清除 list_collections 的缓存，下次调用时重新扫描元数据表"""
+        self._coll_cache = None
+
+    def read_collection(self, collection_name: str, limit: Optional[int] = None,
+                        keys_only: bool = False, projection: Optional[str] = None,
+                        decode_bson: bool = False, use_checkpoint: bool = True) -> Iterator[Any]:
         """
-        读取指定集合的数据
+        以流式方式读取指定集合的数据
+
+        返回一个迭代器，每次产出一条记录，调用方只消费前缀时不会把整张表读入内存。
 
         Args:
             collection_name: 集合名称 (可能需要是 "db_name.collection_name" 格式)
             limit: 限制返回的文档数量
+            keys_only: 只返回 key，不读取 value (如只需计数或建立 key 列表)，
+                省去每行 BSON 字节串的拷贝
+            projection: WiredTiger 列投影，例如 "col1,col2"，会拼成
+                "table:name(col1,col2)"。只对建表时定义了列名的表有效，
+                MongoDB 的集合表没有列名 (value_format=u)，这种情况下请使用 keys_only
+            decode_bson: 将 value 解码为 dict。原始字节按批拼接后一次性交给
+                bson.decode_all，解析过程全程停留在 pymongo 的 C 扩展中。
+                需要安装 pymongo；keys_only 为 True 时忽略
+            use_checkpoint: 从最近一次检查点 (WiredTigerCheckpoint) 读取稳定快照，
+                不做逐行的事务可见性检查；表还没有检查点时自动回退为普通游标
 
         Returns:
-            List[Dict]: 文档列表
+            Iterator[Any]: Row 迭代器；keys_only 为 True 时直接产出 key
         """
-        if not self.session: # 检查 session 是否存在
-            logger.error("未连接到数据库或会话未打开")
-            return []
+        if decode_bson and not keys_only and bson is None:
+            logger.error("decode_bson 需要安装 pymongo (bson 模块)")
+            return iter(())
+
+        documents = self._iter_collection(collection_name, limit, keys_only, projection,
+                                          use_checkpoint=use_checkpoint)
+        if decode_bson and not keys_only:
+            documents = self._decode_bson_batches(documents)
+        return documents
+
+    def read_collection_list(self, collection_name: str, limit: Optional[int] = None,
+                             keys_only: bool = False, projection: Optional[str] = None,
+                             decode_bson: bool = False, use_checkpoint: bool = True) -> List[Any]:
+        """
+        读取指定集合的数据并返回完整列表 (兼容旧接口)
+
+        Args:
+            collection_name: 集合名称 (可能需要是 "db_name.collection_name" 格式)
+            limit: 限制返回的文档数量
+            keys_only: 只返回 key，参见 read_collection
+            projection: WiredTiger 列投影，参见 read_collection
+            decode_bson: 将 value 解码为 dict，参见 read_collection
+            use_checkpoint: 从最近一次检查点读取，参见 read_collection
+
+        Returns:
+            List[Any]: Row 列表；keys_only 为 True 时为 key 列表
+        """
+        return list(self.read_collection(collection_name, limit, keys_only, projection, decode_bson,
+                                         use_checkpoint))
+
+    def read_collections_parallel(self, collection_names: Iterable[str], limit: Optional[int] = None,
+                                  max_workers: int = 4, keys_only: bool = False) -> Dict[str, List[Any]]:
+        """
+        并发读取多个集合，每个工作线程使用自己的会话和游标
+
+        cursor.next() 在 WiredTiger C 扩展内部会释放 GIL，磁盘密集的扫描可以在多线程间重叠。
+
+        Args:
+            collection_names: 集合名称列表，重复的名称只读取一次
+            limit: 每个集合限制返回的文档数量
+            max_workers: 工作线程数，需小于 connect() 的 session_max
+            keys_only: 只返回 key，参见 read_collection
+
+        Returns:
+            Dict[str, List[Any]]: 集合名称到文档列表的映射；
+                无法打开会话或游标 (例如集合不存在) 的集合不出现在结果中，
+                空集合对应空列表
+        """
+        if not self.conn:
+            logger.error("未连接到数据库")
+            return {}
+
+        collection_names = list(dict.fromkeys(collection_names)) # 去重并保持顺序
+        local = threading.local()
+        sessions = []
+
+        def read_one(collection_name: str) -> Optional[List[Any]]:
+            # 每个工作线程首次执行任务时打开会话，之后的任务复用
+            session = getattr(local, "session", None)
+            if session is None:
+                try:
+                    session = self.conn.open_session(SESSION_CONFIG)
+                except Exception as e:
+                    logger.error("读取集合 %s 时打开会话失败: %s", collection_name, e)
+                    return None
+                local.session = session
+                sessions.append(session)
+            # 游标由这里打开而不交给 _iter_collection，以便区分打开失败和空集合
+            try:
+                cursor = self._open_read_cursor(session, collection_name, None, True)
+            except Exception as e:
+                logger.error("读取集合 %s 失败: %s", collection_name, e)
+                return None
+            return list(self._scan_cursor(cursor, collection_name, limit, keys_only))
 
         try:
-            # 通过 self.session 打开游标
-            # 确保 collection_name 是 WiredTiger 期望的表 URI 格式，
-            # 通常是 "table:your_db_name.your_collection_name"
-            # 如果你的 collection_name 参数已经是这个格式，那很好。
-            # 如果它只是一个简单的集合名，你可能需要预先处理它。
-            table_uri = f"table:{collection_name}"
-            cursor = self.session.open_cursor(table_uri, None, None)
-            documents = []
-            count = 0
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(read_one, collection_names))
+        finally:
+            for session in sessions:
+                session.close()
+        return {name: documents for name, documents in zip(collection_names, results) if documents is not None}
+
+    @staticmethod
+    def _decode_bson_batches(documents: Iterator[Any], batch_size: int = BSON_DECODE_BATCH) -> Iterator[Any]:
+        """把原始 BSON 字节按批拼接，每批调用一次 bson.decode_all"""
+        keys = []
+        raw = bytearray()
+        for key, value in documents:
+            keys.append(key)
+            raw += value
+            if len(keys) >= batch_size:
+                yield from map(Row, keys, bson.decode_all(raw))
+                keys = []
+                raw = bytearray()
+        if keys:
+            yield from map(Row, keys, bson.decode_all(raw))
+
+    def read_collection_prefetch(self, collection_name: str, limit: Optional[int] = None,
+                                 keys_only: bool = False, use_checkpoint: bool = True,
+                                 batch_size: int = PREFETCH_BATCH_ROWS,
+                                 queue_depth: int = PREFETCH_QUEUE_DEPTH) -> Iterator[Any]:
+        """
+        用后台线程预读集合数据，调用方处理当前批次的同时下一批已在读取
+
+        后台线程使用自己的会话按批读取，经有界队列交给调用方；cursor.next() 在
+        WiredTiger C 扩展内部会释放 GIL，读取可以和调用方的 Python 处理重叠。
+        适合单条记录处理较重的大表扫描。
 
-            while True: # 使用 while True 和 try-except 来处理 cursor.next()
+        调用方提前停止迭代时，需要显式调用生成器的 close() (或释放对它的全部引用)，
+        后台线程才会退出；close() 关闭连接前也会先停止并等待所有仍在运行的预读线程。
+
+        Args:
+            collection_name: 集合名称 (可能需要是 "db_name.collection_name" 格式)
+            limit: 限制返回的文档数量
+            keys_only: 只返回 key，参见 read_collection
+            use_checkpoint: 从最近一次检查点读取，参见 read_collection
+            batch_size: 每批的行数
+            queue_depth: 队列中最多缓存的批数
+
+        Returns:
+            Iterator[Any]: Row 迭代器；keys_only 为 True 时直接产出 key
+        """
+        if not self.conn:
+            logger.error("未连接到数据库")
+            return
+
+        batches = queue.Queue(maxsize=queue_depth)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # 队列满时定期检查 stop，调用方已停止迭代时不会永远阻塞
+            while not stop.is_set():
                 try:
-                    ret = cursor.next()
-                    if ret != 0: # WT_NOTFOUND (обычно -26) or error
-                        if ret == wiredtiger.WT_NOTFOUND: # 显式检查 WT_NOTFOUND
-                            break
-                        else:
-                            # 抛出错误，让外部的 try-except 捕获
-                            raise wiredtiger.WiredTigerError(f"cursor.next() failed with code: {ret}")
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
-                    if limit and count >= limit:
+        def producer():
+            session = None
+            rows = None
+            try:
+                # WiredTiger 会话不能跨线程共享，后台线程自己打开会话
+                session = self.conn.open_session(SESSION_CONFIG)
+                rows = self._iter_collection(collection_name, limit, keys_only, session=session,
+                                             use_checkpoint=use_checkpoint)
+                while not stop.is_set():
+                    batch = list(itertools.islice(rows, batch_size))
+                    if not batch or not put(batch):
                         break
+            except Exception as e:
+                logger.error("预读集合 %s 失败: %s", collection_name, e)
+            finally:
+                if rows is not None:
+                    rows.close()
+                if session is not None:
+                    session.close()
+                put(_PREFETCH_DONE)
 
-                    key = cursor.get_key()
-                    value = cursor.get_value() # 对于 MongoDB，value 通常是 BSON 编码的字节串
-                    documents.append({
-                        "key": key, # key 通常是 WiredTiger 的内部记录 ID 或索引键
-                        "value": value # 这里是原始字节，可能需要 BSON 解码
-                    })
-                    count += 1
-                except wiredtiger.WiredTigerError as e:
-                    # 检查是否是 WT_NOTFOUND 错误，这表示没有更多数据了
-                    if "WT_NOTFOUND" in str(e) or e.errno == wiredtiger.WT_NOTFOUND:
+        thread = threading.Thread(target=producer, name=f"wt-prefetch-{collection_name}", daemon=True)
+        prefetcher = (stop, thread)
+        self._prefetchers.add(prefetcher)
+        thread.start()
+        try:
+            while True:
+                try:
+                    batch = batches.get(timeout=0.1)
+                except queue.Empty:
+                    if thread.is_alive():
+                        continue
+                    # close() 停止了后台线程时不会再收到结束标记，直接结束
+                    if stop.is_set():
                         break
-                    else:
-                        logger.error(f"读取集合 {collection_name} 时游标迭代出错: {str(e)}")
-                        raise e # 重新抛出，让外部的 try-except 捕获
+                    # 后台线程可能在 get() 超时和 is_alive() 之间放入了最后几批和结束标记，
+                    # 先把队列中剩余的批次取完再结束
+                    while True:
+                        try:
+                            batch = batches.get_nowait()
+                        except queue.Empty:
+                            break
+                        if batch is _PREFETCH_DONE:
+                            break
+                        yield from batch
+                    break
+                if batch is _PREFETCH_DONE:
+                    break
+                yield from batch
+        finally:
+            stop.set()
+            thread.join()
+            self._prefetchers.discard(prefetcher)
+
+    def read_range(self, collection_name: str, start_key: Any, end_key: Any = None,
+                   limit: Optional[int] = None, keys_only: bool = False,
+                   use_checkpoint: bool = True) -> Iterator[Any]:
+        """
+        读取 key 落在 [start_key, end_key] 区间内的记录
+
+        通过 set_key + search_near 在 B 树中直接定位到起点，而不是从头扫描再在 Python 中过滤。
+        start_key 和 end_key 必须符合表的 key_format，
+        MongoDB 的集合表 (key_format=q) 中 key 是 int64 的 RecordId。
+
+        Args:
+            collection_name: 集合名称 (可能需要是 "db_name.collection_name" 格式)
+            start_key: 起始 key (包含)
+            end_key: 结束 key (包含)，None 表示一直读到表尾
+            limit: 限制返回的文档数量
+            keys_only: 只返回 key，参见 read_collection
+            use_checkpoint: 从最近一次检查点读取，参见 read_collection
 
+        Returns:
+            Iterator[Any]: Row 迭代器；keys_only 为 True 时直接产出 key
+        """
+        if not self.session: # 检查 session 是否存在
+            logger.error("未连接到数据库或会话未打开")
+            return
+
+        try:
+            cursor = self._open_read_cursor(self.session, collection_name, None, use_checkpoint)
+        except Exception as e:
+            logger.error("读取集合 %s 失败: %s", collection_name, e)
+            return
+
+        nxt = cursor.next
+        getk = cursor.get_key
+        getv = self._value_getter(cursor, None)
+        WT_NF = wiredtiger.WT_NOTFOUND
+        has_limit = bool(limit)
+        lim = limit or 0
+        count = 0
+        has_end = end_key is not None
+
+        try:
+            cursor.set_key(start_key)
+            # search_near 返回 -1/0/1 表示定位到的 key 小于/等于/大于 start_key，空表返回 WT_NOTFOUND
+            exact = cursor.search_near()
+            if exact == WT_NF:
+                return
+            # 定位到比 start_key 小的记录时前进一条；否则当前行就是第一条结果
+            ret = nxt() if exact < 0 else 0
+            while ret == 0 and (not has_limit or count < lim):
+                key = getk()
+                if has_end and key > end_key:
+                    break
+                count += 1
+                if keys_only:
+                    yield key
+                else:
+                    yield Row(key, getv())
+                ret = nxt()
+            if ret != 0 and ret != WT_NF:
+                logger.error("读取集合 %s 时游标迭代出错: cursor.next() 返回 %s", collection_name, ret)
+        except Exception as e:
+            logger.error("读取集合 %s 失败: %s", collection_name, e)
+        finally:
             cursor.close()
-            return documents
+
+    @staticmethod
+    def _open_read_cursor(session, collection_name: str, projection: Optional[str], use_checkpoint: bool):
+        """打开只读游标；要求读取检查点但表还没有检查点时回退为普通游标"""
+        # 确保 collection_name 是 WiredTiger 期望的表 URI 格式，
+        # 通常是 "table:your_db_name.your_collection_name"
+        # 如果你的 collection_name 参数已经是这个格式，那很好。
+        # 如果它只是一个简单的集合名，你可能需要预先处理它。
+        table_uri = f"table:{collection_name}"
+        if projection:
+            table_uri = f"{table_uri}({projection})"
+        if not use_checkpoint:
+            return session.open_cursor(table_uri, None, CURSOR_CONFIG)
+        try:
+            return session.open_cursor(table_uri, None, CHECKPOINT_CURSOR_CONFIG)
+        except wiredtiger.WiredTigerError as e:
+            # 对象从未进入过检查点时 WiredTiger 返回 WT_NOTFOUND；绑定层抛出的异常没有 errno，
+            # 只带 wiredtiger_strerror() 的文本。表不存在等其他错误是 ENOENT 等，直接抛出
+            if str(e) != wiredtiger.wiredtiger_strerror(wiredtiger.WT_NOTFOUND):
+                raise
+            logger.debug("集合 %s 没有可用的检查点，改为读取最新数据", collection_name)
+            return session.open_cursor(table_uri, None, CURSOR_CONFIG)
+
+    @staticmethod
+    def _value_getter(cursor, projection: Optional[str]):
+        """返回读取当前行 value 的函数"""
+        if cursor.value_format == "u" and not projection and hasattr(cursor, "_get_value"):
+            # Python 绑定的游标总是 raw 模式，value_format 为 u 时原始字节就是 value 本身。
+            # 直接取原始字节只是跳过 get_value() -> get_values() -> unpack() 这几层 Python 调用，
+            # 并不少拷贝 (unpack 对末尾 u 列做的 s[:len(s)] 返回原对象)。
+            # _get_value 是 SWIG 生成的私有方法，不存在时回退到 get_value
+            return cursor._get_value
+        return cursor.get_value
+
+    def _iter_collection(self, collection_name: str, limit: Optional[int] = None, keys_only: bool = False,
+                         projection: Optional[str] = None, session=None,
+                         use_checkpoint: bool = True) -> Iterator[Any]:
+        """逐条产出集合中的记录，游标在迭代结束或生成器被关闭时释放"""
+        if session is None:
+            session = self.session
+        if not session: # 检查 session 是否存在
+            logger.error("未连接到数据库或会话未打开")
+            return
+
+        try:
+            cursor = self._open_read_cursor(session, collection_name, projection, use_checkpoint)
         except Exception as e:
-            logger.error(f"读取集合 {collection_name} 失败: {str(e)}")
-            return []
+            logger.error("读取集合 %s 失败: %s", collection_name, e)
+            return
+        yield from self._scan_cursor(cursor, collection_name, limit, keys_only, projection)
+
+    def _scan_cursor(self, cursor, collection_name: str, limit: Optional[int] = None,
+                     keys_only: bool = False, projection: Optional[str] = None) -> Iterator[Any]:
+        """从已打开的游标逐条产出记录，迭代结束或生成器被关闭时关闭游标"""
+        # 上限检查放在移动游标之前：读满 limit 条后既不再调用 next()，也不再拷贝 value
+        has_limit = bool(limit)
+        lim = limit or 0
+        count = 0
+
+        try:
+            # MongoDB 集合表 (key_format=q, value_format=u) 优先走 C 扩展，整批在 C 中读取
+            if (_wt_fast is not None and not projection
+                    and cursor.key_format == "q" and cursor.value_format == "u"):
+                next_batch = _wt_fast.next_batch
+                cursor_addr = int(cursor.this)
+                while not has_limit or count < lim:
+                    batch_rows = min(FAST_BATCH_ROWS, lim - count) if has_limit else FAST_BATCH_ROWS
+                    batch = next_batch(cursor_addr, batch_rows, keys_only)
+                    if not batch:
+                        break
+                    count += len(batch)
+                    if keys_only:
+                        yield from batch
+                    else:
+                        yield from map(Row._make, batch)
+                return
+
+            # 热循环中用到的方法和常量提前绑定为局部变量，避免每行重复的属性查找
+            nxt = cursor.next
+            getk = cursor.get_key
+            getv = self._value_getter(cursor, projection)
+            WT_NF = wiredtiger.WT_NOTFOUND
+
+            # cursor.next() 以返回码的形式给出 WT_NOTFOUND，直接按返回码分支，
+            # 循环内不构造、也不捕获异常。
+            # 没有使用 "for key, value in cursor"：绑定的迭代器每行都会调用
+            # get_keys() + get_values() 并拼接成新列表，比直接调用 next/get_key/get_value 更慢
+            while not has_limit or count < lim:
+                ret = nxt()
+                if ret == 0:
+                    count += 1
+                    if keys_only:
+                        yield getk()
+                    else:
+                        yield Row(getk(), getv())
+                elif ret == WT_NF:
+                    break
+                else:
+                    logger.error("读取集合 %s 时游标迭代出错: cursor.next() 返回 %s", collection_name, ret)
+                    break
+        except Exception as e:
+            logger.error("读取集合 %s 失败: %s", collection_name, e)
+        finally:
+            # 生成器被提前关闭 (GeneratorExit) 时同样会走到这里
+            cursor.close()
 
     def close(self):
         """关闭数据库连接和会话"""
+        self._coll_cache = None
+        # 关闭连接时不能有其他线程仍在调用 WiredTiger，先停止预读线程
+        for stop, thread in list(self._prefetchers):
+            stop.set()
+            thread.join()
+        self._prefetchers.clear()
         if self.session:
             self.session.close()
             self.session = None
@@ -211,15 +664,18 @@ def main():
             # (例如 "myDB.myCollection")
             limit = int(sys.argv[3]) if len(sys.argv) > 3 else None
             print(f"\n尝试读取集合 (表) '{collection_name_arg}' 的数据...")
-            documents = reader.read_collection(collection_name_arg, limit)
-            if documents:
-                print(f"集合 {collection_name_arg} 中的前 {len(documents)} 条数据 (原始 WiredTiger 记录):")
-                for doc in documents:
-                    # 注意：这里的 value 是原始字节，如果是 MongoDB 数据，你需要 BSON 解码
-                    # 例如：import bson; decoded_value = bson.decode(doc['value'])
-                    print(f"  Key: {doc['key']}, Value (raw bytes length): {len(doc['value'])}")
-                    # 为了演示，可以尝试打印少量字节
-                    # print(f"    Value (first 50 bytes): {doc['value'][:50]}")
+            count = 0
+            for doc in reader.read_collection(collection_name_arg, limit):
+                if count == 0:
+                    print(f"集合 {collection_name_arg} 中的数据 (原始 WiredTiger 记录):")
+                # 注意：这里的 value 是原始字节，如果是 MongoDB 数据，你需要 BSON 解码
+                # 例如：import bson; decoded_value = bson.decode(doc.value)
+                print(f"  Key: {doc.key}, Value (raw bytes length): {len(doc.value)}")
+                # 为了演示，可以尝试打印少量字节
+                # print(f"    Value (first 50 bytes): {doc.value[:50]}")
+                count += 1
+            if count:
+                print(f"共读取 {count} 条数据")
             else:
                 print(f"未能从集合 (表) {collection_name_arg} 读取到数据，或集合为空。")
     finally: